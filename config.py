@@ -56,7 +56,10 @@ MAX_CONCURRENT_VALIDATIONS_QUEUE = int(os.getenv('MAX_CONCURRENT_VALIDATIONS_QUE
 
 # High-Performance Scaling Settings
 MAX_ACTIVE_VALIDATION_JOBS = int(os.getenv('MAX_ACTIVE_VALIDATION_JOBS', '500'))
-DATABASE_CONNECTION_POOL_SIZE = int(os.getenv('DATABASE_CONNECTION_POOL_SIZE', '25'))
+# Pool sizes are per process: every gunicorn worker opens its own pool (see gunicorn.conf.py)
+DATABASE_CONNECTION_POOL_SIZE = int(os.getenv('DATABASE_CONNECTION_POOL_SIZE', '5'))
+DATABASE_MAX_OVERFLOW = int(os.getenv('DATABASE_MAX_OVERFLOW', '10'))
+DATABASE_POOL_RECYCLE = int(os.getenv('DATABASE_POOL_RECYCLE', '1800'))  # Seconds
 ENABLE_RESULT_CACHING = os.getenv('ENABLE_RESULT_CACHING', 'true').lower() == 'true'
 
 # BlockBee Configuration
@@ -66,12 +69,13 @@ if not BLOCKBEE_API_KEY:
 
 BLOCKBEE_BASE_URL = os.getenv('BLOCKBEE_BASE_URL', 'https://api.blockbee.io')
 
-BLOCKBEE_PUBLIC_KEY = os.getenv('BLOCKBEE_PUBLIC_KEY', """----BEGIN PUBLIC KEY-----
+BLOCKBEE_PUBLIC_KEY = os.getenv('BLOCKBEE_PUBLIC_KEY', """-----BEGIN PUBLIC KEY-----
 MIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQC3FT0Ym8b3myVxhQW7ESuuu6lo
 dGAsUJs4fq+Ey//jm27jQ7HHHDmP1YJO7XE7Jf/0DTEJgcw4EZhJFVwsk6d3+4fy
 Bsn0tKeyGMiaE6cVkX0cy6Y85o8zgc/CwZKc0uw6d5siAo++xl2zl+RGMXCELQVE
 ox7pp208zTvown577wIDAQAB
 -----END PUBLIC KEY-----""")    
+BLOCKBEE_VERIFY_SIGNATURE = os.getenv('BLOCKBEE_VERIFY_SIGNATURE', 'true').lower() == 'true'
 
 # External API URLs
 COINGECKO_API_BASE = os.getenv('COINGECKO_API_BASE', 'https://api.coingecko.com/api/v3')
@@ -2,10 +2,14 @@
 Database initialization and session management
 """
 import os
+import logging
 from sqlalchemy import create_engine
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from sqlalchemy.pool import StaticPool
-from config import DATABASE_URL
+from config import DATABASE_URL, DATABASE_CONNECTION_POOL_SIZE, DATABASE_MAX_OVERFLOW, DATABASE_POOL_RECYCLE
+
+logger = logging.getLogger(__name__)
 
 class Base(DeclarativeBase):
     pass
@@ -23,8 +27,12 @@ if DATABASE_URL.startswith('sqlite'):
 else:
     engine = create_engine(
         DATABASE_URL,
-        pool_recycle=300,
+        pool_size=DATABASE_CONNECTION_POOL_SIZE,
+        max_overflow=DATABASE_MAX_OVERFLOW,
+        pool_recycle=DATABASE_POOL_RECYCLE,
         pool_pre_ping=True,
+        # Reuse the most recently returned connection so idle ones can be recycled
+        pool_use_lifo=True,
         echo=False
     )
 
@@ -46,4 +54,14 @@ def init_database():
     # Create all tables
     Base.metadata.create_all(bind=engine)
     
+    # create_all() skips indexes on tables that already exist, so add any new ones explicitly
+    # Existing rows can violate a new unique index; log it and start anyway rather than
+    # abort, since the index is an optimisation/guard and not needed to serve requests
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except SQLAlchemyError as e:
+                logger.error(f"Could not create index {index.name} on {table.name}: {e}")
+    
     return True
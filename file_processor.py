@@ -2,13 +2,17 @@
 File processing service for handling email and phone lists
 """
 import os
+import importlib.util
 import tempfile
 import pandas as pd
-from typing import List, Dict, Tuple, Optional, Any
+from typing import List, Dict, Tuple, Optional, Any, Iterator
 from config import MAX_FILE_SIZE_MB, ALLOWED_FILE_EXTENSIONS
-from utils import create_results_csv, format_file_size, is_valid_email_syntax
+from utils import create_results_csv, format_file_size, is_valid_email_syntax, EMAIL_SYNTAX_PATTERN
 import uuid
 
+# Parse CSVs with the multithreaded Arrow reader when pyarrow is installed
+_CSV_ENGINE_KWARGS = {'engine': 'pyarrow', 'dtype_backend': 'pyarrow'} if importlib.util.find_spec('pyarrow') else {}
+
 class FileProcessor:
     def __init__(self):
         self.temp_dir = tempfile.gettempdir()
@@ -46,10 +50,12 @@ class FileProcessor:
                 # Read phone numbers from file
                 items = self._read_phones_from_file(file_path)
             
-            # Remove duplicates while preserving order
+            # Remove duplicates while preserving order (items may be a generator)
             unique_items = []
             seen = set()
+            original_count = 0
             for item in items:
+                original_count += 1
                 item_lower = item.lower() if validation_type == 'email' else item
                 if item_lower not in seen:
                     unique_items.append(item)
@@ -57,9 +63,9 @@ class FileProcessor:
             
             # Get file info
             file_info = {
-                'original_count': len(items),
+                'original_count': original_count,
                 'unique_count': len(unique_items),
-                'duplicates_removed': len(items) - len(unique_items),
+                'duplicates_removed': original_count - len(unique_items),
                 'file_size': os.path.getsize(file_path),
                 'file_extension': os.path.splitext(file_path)[1].lower()
             }
@@ -69,56 +75,59 @@ class FileProcessor:
         except Exception as e:
             raise Exception(f"Failed to process file: {str(e)}")
     
-    def _read_emails_from_file(self, file_path: str) -> List[str]:
-        """Read emails from various file formats"""
-        emails = []
+    def _read_emails_from_file(self, file_path: str) -> Iterator[str]:
+        """Yield syntactically valid emails from various file formats
+        
+        CSV and TXT files are streamed, so peak memory stays bounded by the
+        chunk size rather than the file size.
+        """
         file_ext = os.path.splitext(file_path)[1].lower()
+        # Try common column names for emails
+        email_columns = ['email', 'Email', 'EMAIL', 'e-mail', 'E-mail']
         
         try:
             if file_ext == '.csv':
-                df = pd.read_csv(file_path)
-                # Try common column names for emails
-                email_columns = ['email', 'Email', 'EMAIL', 'e-mail', 'E-mail']
-                email_column = None
+                # Read the header first so only the email column is parsed
+                header = pd.read_csv(file_path, nrows=0).columns
+                # If no email column found, use first column. Selected by position because
+                # pandas invents names such as 'Unnamed: 0' that the Arrow reader never sees
+                email_column = next((col for col in email_columns if col in header), None)
+                usecols = [header.get_loc(email_column) if email_column else 0]
                 
-                for col in email_columns:
-                    if col in df.columns:
-                        email_column = col
-                        break
-                
-                if email_column:
-                    emails = df[email_column].dropna().astype(str).tolist()
+                if _CSV_ENGINE_KWARGS:
+                    # The Arrow reader has no chunked mode but keeps strings in compact buffers
+                    chunks = [pd.read_csv(file_path, usecols=usecols, dtype=str, **_CSV_ENGINE_KWARGS)]
                 else:
-                    # If no email column found, try first column
-                    emails = df.iloc[:, 0].dropna().astype(str).tolist()
+                    chunks = pd.read_csv(file_path, usecols=usecols, dtype=str, chunksize=100_000)
+                
+                for df in chunks:
+                    yield from self._filter_valid_emails(df.iloc[:, 0])
                     
             elif file_ext in ['.xlsx', '.xls']:
                 df = pd.read_excel(file_path)
                 # Similar logic as CSV
-                email_columns = ['email', 'Email', 'EMAIL', 'e-mail', 'E-mail']
-                email_column = None
-                
-                for col in email_columns:
-                    if col in df.columns:
-                        email_column = col
-                        break
+                email_column = next((col for col in email_columns if col in df.columns), None)
                 
                 if email_column:
-                    emails = df[email_column].dropna().astype(str).tolist()
+                    yield from self._filter_valid_emails(df[email_column])
                 else:
-                    emails = df.iloc[:, 0].dropna().astype(str).tolist()
+                    yield from self._filter_valid_emails(df.iloc[:, 0])
                     
             elif file_ext == '.txt':
                 with open(file_path, 'r', encoding='utf-8') as f:
-                    emails = [line.strip() for line in f if line.strip()]
-            
-            # Filter out invalid email formats
-            valid_emails = [email for email in emails if is_valid_email_syntax(email)]
-            return valid_emails
+                    for line in f:
+                        email = line.strip()
+                        if email and is_valid_email_syntax(email):
+                            yield email
             
         except Exception as e:
             raise Exception(f"Error reading file: {str(e)}")
     
+    def _filter_valid_emails(self, emails: pd.Series) -> List[str]:
+        """Filter out invalid email formats in one vectorized pass"""
+        emails = emails.dropna().astype(str)
+        return emails[emails.str.match(EMAIL_SYNTAX_PATTERN)].tolist()
+    
     def _read_phones_from_file(self, file_path: str) -> List[str]:
         """Read phone numbers from various file formats"""
         phones = []
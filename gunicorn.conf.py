@@ -0,0 +1,47 @@
+"""
+Gunicorn configuration for the webhook and payment API servers
+
+Usage:
+    PORT=5000 gunicorn -c gunicorn.conf.py payment_api:app
+    PORT=5002 gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import os
+import multiprocessing
+from importlib.util import find_spec
+
+# No default: the payment API and the legacy webhook server (which forwards to the
+# payment API on port 5000) must each be bound explicitly
+if not os.getenv('PORT'):
+    raise RuntimeError("PORT environment variable is required (5000 for payment_api, 5002 for wsgi)")
+bind = f"0.0.0.0:{os.getenv('PORT')}"
+# Each worker has its own SQLAlchemy pool of up to DATABASE_CONNECTION_POOL_SIZE +
+# DATABASE_MAX_OVERFLOW connections (5 + 10 by default), so a server can open
+# workers * 15 connections. Keep that, summed over the webhook and payment API
+# servers, below Postgres max_connections (100 by default) by lowering
+# GUNICORN_WORKERS or the pool settings.
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+# Webhook handlers spend most of their time waiting on the database and
+# outbound HTTP, so use cooperative gevent workers when gevent is installed
+# and fall back to threaded workers otherwise. psycogreen is required too:
+# without it every psycopg2 call blocks the worker's whole event loop
+USE_GEVENT = find_spec('gevent') is not None and find_spec('psycogreen') is not None
+
+if USE_GEVENT:
+    worker_class = 'gevent'
+    worker_connections = 1000
+else:
+    worker_class = 'gthread'
+    threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+keepalive = 30
+timeout = 60
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """Make psycopg2 cooperate with gevent in every worker, whichever app it serves"""
+    if USE_GEVENT:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
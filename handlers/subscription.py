@@ -192,14 +192,13 @@ Select your preferred payment method:
                 parse_mode='Markdown'
             )
 
-            # Check for existing pending subscription and cancel it first
-            existing_pending = db.query(Subscription).filter(
+            # Cancel every existing pending subscription first, so at most one is ever pending
+            cancelled = db.query(Subscription).filter(
                 Subscription.user_id == user.id,
                 Subscription.status == 'pending'
-            ).first()
-            if existing_pending:
-                logger.info(f"Canceling existing pending subscription for user {user.id}")
-                existing_pending.status = "cancelled"
+            ).update({'status': 'cancelled'}, synchronize_session=False)
+            if cancelled:
+                logger.info(f"Canceled {cancelled} existing pending subscription(s) for user {user.id}")
                 db.commit()
 
             # create a subscription row first
@@ -665,9 +664,15 @@ This usually takes 1-3 confirmations (5-30 minutes).
                 )
                 return
             
-            # Store transaction hash
+            # Store transaction hash and activate in one commit, before any Telegram I/O,
+            # so a failed reply cannot roll the hash back or hold the transaction open
             subscription.transaction_hash = tx_hash
-            db.commit()
+            
+            # In a real implementation, you'd verify the transaction here
+            # For demo purposes, we'll activate immediately
+            subscription_manager = SubscriptionManager(db)
+            subscription_manager.activate_subscription(subscription)
+            subscription_manager.commit()
             
             # Clear user state
             context.user_data['waiting_for_transaction'] = False
@@ -692,11 +697,6 @@ You'll receive a confirmation message once your subscription is activated.
                 parse_mode='Markdown'
             )
             
-            # In a real implementation, you'd verify the transaction here
-            # For demo purposes, we'll activate immediately
-            subscription_manager = SubscriptionManager(db)
-            subscription_manager.activate_subscription(subscription)
-            
             # Send activation confirmation
             await context.bot.send_message(
                 chat_id=update.effective_chat.id,
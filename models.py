@@ -2,7 +2,7 @@
 Database models for the email validator bot
 """
 from datetime import datetime, timedelta
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, ForeignKey, Index, text, update, select, or_
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -126,6 +126,25 @@ class Subscription(Base):
     # Relationships
     user = relationship("User", back_populates="subscriptions", lazy="select")
     
+    __table_args__ = (
+        # Partial index for the expiry sweep: active subscriptions ordered by expiry
+        Index(
+            'ix_sub_status_expires', 'status', 'expires_at',
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'")
+        ),
+        # At most one pending payment per user and currency, enforced by the database
+        Index(
+            'ux_sub_pending', 'user_id', 'payment_currency_crypto', unique=True,
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'")
+        ),
+        # Webhook lookups by payment address, per-user status checks and pending sweeps
+        Index('ix_sub_addr_status', 'payment_address', 'status'),
+        Index('ix_sub_user_status_ccy', 'user_id', 'status', 'payment_currency_crypto'),
+        Index('ix_sub_status_created', 'status', 'created_at'),
+    )
+    
     def __repr__(self):
         return f"<Subscription(id={self.id}, status={self.status})>"
     
@@ -151,13 +170,45 @@ class Subscription(Base):
         if not self.expires_at or not self.is_active():
             return 0
         
-        remaining = self.expires_at - datetime.utcnow()
+        return Subscription.days_until(self.expires_at)
+    
+    @staticmethod
+    def days_until(expires_at):
+        """Get days remaining until expires_at, counting a partial day as a full one"""
+        remaining = expires_at - datetime.utcnow()
         
         # Include partial days in calculation for accuracy
         # If there are hours remaining on the final day, count it as a full day
         days_with_hours = remaining.total_seconds() / 86400  # 86400 seconds per day
         
         return max(0, int(days_with_hours) + (1 if days_with_hours % 1 > 0 else 0))
+    
+    @classmethod
+    def get_active_slim(cls, db, user_id):
+        """Get (id, expires_at) of the user's active subscription without loading the entity"""
+        now = datetime.utcnow()
+        return db.execute(
+            select(cls.id, cls.expires_at)
+            .where(
+                cls.user_id == user_id,
+                cls.status == 'active',
+                or_(cls.expires_at.is_(None), cls.expires_at >= now)
+            )
+            .limit(1)
+        ).first()
+    
+    @classmethod
+    def expire_bulk(cls, db, ids):
+        """Mark the given active subscriptions as expired with a single UPDATE"""
+        if not ids:
+            return 0
+        
+        result = db.execute(
+            update(cls)
+            .where(cls.id.in_(ids), cls.status == 'active')
+            .values(status='expired')
+        )
+        return result.rowcount
 
 class ValidationJob(Base):
     __tablename__ = 'validation_jobs'
@@ -6,11 +6,12 @@ import os
 import logging
 import requests
 import asyncio
+import threading
 from datetime import datetime, timedelta
 from flask import Flask, request, jsonify
 from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Boolean, Text
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, joinedload
 from sqlalchemy.exc import SQLAlchemyError, DatabaseError
 from sqlalchemy.dialects.postgresql import UUID
 from services.blockbee_signature import verify_blockbee_signature
@@ -18,7 +19,7 @@ from models import Subscription
 from datetime import datetime, timedelta
 from config import SUBSCRIPTION_DURATION_DAYS, SUPPORT_EMAIL
 import uuid
-from models import Subscription, User
+from models import Subscription
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -112,6 +113,39 @@ def get_db():
     """Get database session"""
     return SessionLocal()
 
+# Test hook: events set once a webhook for the given order_id has been processed
+_webhook_waiters = {}
+_webhook_waiters_lock = threading.Lock()
+
+def register_wait(order_id) -> threading.Event:
+    """Register interest in an order's webhook; wait on the returned event instead of sleeping.
+
+    A webhook that never arrives leaves the entry behind, so callers must pair this
+    with unregister_wait in a finally block:
+
+        event = register_wait(order_id)
+        try:
+            event.wait(timeout)
+        finally:
+            unregister_wait(order_id)
+    """
+    with _webhook_waiters_lock:
+        return _webhook_waiters.setdefault(str(order_id), threading.Event())
+
+def unregister_wait(order_id) -> None:
+    """Drop an order's waiter, whether or not its webhook arrived"""
+    with _webhook_waiters_lock:
+        _webhook_waiters.pop(str(order_id), None)
+
+def _notify_webhook_processed(order_id) -> None:
+    """Wake anyone waiting for this order's webhook to finish processing"""
+    if not order_id:
+        return
+    with _webhook_waiters_lock:
+        event = _webhook_waiters.pop(str(order_id), None)
+    if event:
+        event.set()
+
 # Simple text sender for underpayment notices (confirmed success DM uses your existing helper)
 def send_telegram_text(chat_id: str, text: str) -> bool:
     url = f"{TELEGRAM_API_URL}/sendMessage"
@@ -341,7 +375,7 @@ def webhook():
 
         # 1) Prefer Subscription when order_id is numeric (you put subscription.id in the callback)
         if raw_order_id and str(raw_order_id).isdigit():
-            subscription = db.query(Subscription).get(int(raw_order_id))
+            subscription = db.query(Subscription).options(joinedload(Subscription.user)).get(int(raw_order_id))
             if subscription:
                 logger.info(f"Matched Subscription id={subscription.id}")
 
@@ -359,6 +393,7 @@ def webhook():
         if not subscription and not payment_order and address_in:
             subscription = (
                 db.query(Subscription)
+                .options(joinedload(Subscription.user))
                 .filter(Subscription.payment_address == address_in)
                 .order_by(Subscription.created_at.desc())
                 .first()
@@ -422,8 +457,8 @@ def webhook():
             # ---- Always upsert PaymentUser (source of truth for Telegram chat id) ----
             chat_id = None
             if subscription:
-                # subscription.user_id is your internal Users.id
-                urow = db.query(User).get(int(subscription.user_id))
+                # The owning User row was eager-loaded with the subscription
+                urow = subscription.user
                 if urow and urow.telegram_id:
                     chat_id = str(urow.telegram_id)
             if not chat_id:
@@ -561,6 +596,7 @@ def webhook():
         return "ok", 200
     finally:
         db.close()
+        _notify_webhook_processed(raw_order_id)
 
 
 @app.route('/payment/<order_id>/status', methods=['GET'])
@@ -5,6 +5,7 @@ import phonenumbers
 from phonenumbers import geocoder, carrier, timezone
 from phonenumbers.phonenumberutil import NumberParseException
 import logging
+import re
 import signal
 from typing import Dict, List, Optional, Tuple
 import asyncio
@@ -38,6 +39,14 @@ class PhoneValidator:
     def __init__(self):
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=20)
         
+        # Fallback extraction patterns, compiled once instead of on every call
+        self._phone_patterns = [
+            re.compile(r'\+?\d{1,4}[\s.-]?\(?\d{1,4}\)?[\s.-]?\d{1,4}[\s.-]?\d{1,4}[\s.-]?\d{1,9}'),
+            re.compile(r'\(\d{3}\)\s*\d{3}[\s.-]?\d{4}'),  # US format (XXX) XXX-XXXX
+            re.compile(r'\d{3}[\s.-]\d{3}[\s.-]\d{4}'),    # US format XXX-XXX-XXXX
+            re.compile(r'\+\d{1,3}\s?\d{4,14}'),           # International format
+        ]
+        
     def get_number_type(self, number_type: int) -> str:
         """Convert number type to human readable format"""
         types = {
@@ -858,7 +867,8 @@ class PhoneValidator:
         """Validate a batch of phone numbers asynchronously with timeout protection"""
         loop = asyncio.get_running_loop()
         
-        # Create tasks for concurrent validation
+        # Create tasks for concurrent validation; self.executor's worker count bounds
+        # how many run at once
         tasks = []
         for number in phone_numbers:
             task = loop.run_in_executor(
@@ -914,18 +924,8 @@ class PhoneValidator:
         
         # Also try some common patterns if no matches found
         if not phone_numbers:
-            import re
-            # Common phone patterns
-            patterns = [
-                r'\+?\d{1,4}[\s.-]?\(?\d{1,4}\)?[\s.-]?\d{1,4}[\s.-]?\d{1,4}[\s.-]?\d{1,9}',
-                r'\(\d{3}\)\s*\d{3}[\s.-]?\d{4}',  # US format (XXX) XXX-XXXX
-                r'\d{3}[\s.-]\d{3}[\s.-]\d{4}',    # US format XXX-XXX-XXXX
-                r'\+\d{1,3}\s?\d{4,14}',           # International format
-            ]
-            
-            for pattern in patterns:
-                matches = re.findall(pattern, text)
-                phone_numbers.extend(matches)
+            for pattern in self._phone_patterns:
+                phone_numbers.extend(pattern.findall(text))
         
         # Remove duplicates while preserving order
         seen = set()
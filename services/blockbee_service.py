@@ -4,19 +4,55 @@ BlockBee cryptocurrency payment service integration
 import os
 import requests
 import logging
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import qrcode
 from urllib.parse import urlencode
 from io import BytesIO
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from cachetools import TTLCache
 from config import BLOCKBEE_API_KEY, BLOCKBEE_WEBHOOK_URL, SUPPORTED_CRYPTOS, BLOCKBEE_BASE_URL, COINGECKO_API_BASE
 
 logger = logging.getLogger(__name__)
 
+# Process-wide HTTP session so every BlockBeeService instance reuses the same
+# keep-alive connections instead of a new TCP+TLS handshake per request
+_HTTP = requests.Session()
+_HTTP.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=32))
+_HTTP.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32))
+# Price lookups are idempotent reads, so they may be retried safely
+_HTTP.mount(COINGECKO_API_BASE, HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=10,
+    max_retries=Retry(total=2, backoff_factor=0.2)
+))
+
+# Our currency codes -> CoinGecko coin IDs
+_COINGECKO_IDS = {
+    'btc': 'bitcoin',
+    'eth': 'ethereum',
+    'ltc': 'litecoin',
+    'doge': 'dogecoin',
+    'usdt_trc20': 'tether',
+    'usdt_erc20': 'tether',
+    'trx': 'tron',
+    'bsc': 'binancecoin'
+}
+
+# USD prices keyed on lowercased currency; prices move over minutes, not per request
+_price_cache = TTLCache(maxsize=64, ttl=60)
+# Last price ever fetched per currency, used when CoinGecko is unreachable
+_last_known_prices: Dict[str, float] = {}
+_price_lock = threading.Lock()
+
 class BlockBeeService:
     def __init__(self):
         self.api_key = BLOCKBEE_API_KEY
         self.base_url = BLOCKBEE_BASE_URL
         self.webhook_url = BLOCKBEE_WEBHOOK_URL
+        self.session = _HTTP
     
     def create_payment_address(self, currency: str, user_id: str, amount_usd: float, order_id: str) -> Dict:
         """Create payment address via BlockBee API forcing a NEW address per order_id"""
@@ -70,7 +106,7 @@ class BlockBeeService:
                 'Accept': 'application/json'
             }
             
-            response = requests.get(f"{self.base_url}/{blockbee_currency}/create/", params=params, headers=headers, timeout=30)
+            response = self.session.get(f"{self.base_url}/{blockbee_currency}/create/", params=params, headers=headers, timeout=30)
             
             if response.status_code == 200:
                 data = response.json()
@@ -115,6 +151,19 @@ class BlockBeeService:
             logger.error(f"Error getting payment info: {e}")
             return {'success': False, 'error': 'Payment info failed'}
     
+    def create_payment_addresses_batch(self, specs: List[Dict]) -> List[Dict]:
+        """Create several payment addresses concurrently, preserving input order
+        
+        Each spec holds the keyword arguments for create_payment_address. BlockBee
+        has no batch endpoint, so the requests are issued in parallel over the
+        shared session instead of one round-trip after another.
+        """
+        if not specs:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(len(specs), 8)) as executor:
+            return list(executor.map(lambda spec: self.create_payment_address(**spec), specs))
+    
     def _log_address_uniqueness(self, payment_address: str, user_id: str):
         """Check and log address uniqueness"""
         try:
@@ -145,7 +194,7 @@ class BlockBeeService:
                 'value': amount_usd,
                 'from': 'USD'
             }
-            response = requests.get(f"{self.base_url}/{currency}/convert/", params=params)
+            response = self.session.get(f"{self.base_url}/{currency}/convert/", params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -205,7 +254,7 @@ class BlockBeeService:
             params = {'apikey': self.api_key}
             if address:
                 params['address'] = address
-            response = requests.get(f"{self.base_url}/{blockbee_currency}/info/", params=params)
+            response = self.session.get(f"{self.base_url}/{blockbee_currency}/info/", params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -266,7 +315,7 @@ class BlockBeeService:
     def verify_payment(self, reference: str) -> Dict:
         """Verify payment status via BlockBee"""
         try:
-            response = requests.get(f"{self.base_url}/info/{reference}")
+            response = self.session.get(f"{self.base_url}/info/{reference}")
             
             if response.status_code == 200:
                 data = response.json()
@@ -284,37 +333,54 @@ class BlockBeeService:
             return {'success': False, 'error': str(e)}
     
     def get_crypto_price(self, currency: str) -> Optional[float]:
-        """Get current crypto price in USD"""
-        try:
-            # Map to CoinGecko IDs
-            coin_mapping = {
-                'btc': 'bitcoin',
-                'eth': 'ethereum',
-                'ltc': 'litecoin', 
-                'doge': 'dogecoin',
-                'usdt_trc20': 'tether',
-                'usdt_erc20': 'tether',
-                'trx': 'tron',
-                'bsc': 'binancecoin'
-            }
-            
-            coin_id = coin_mapping.get(currency)
-            if not coin_id:
-                return None
-            
-            response = requests.get(
-                f"{COINGECKO_API_BASE}/simple/price?ids={coin_id}&vs_currencies=usd"
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data.get(coin_id, {}).get('usd')
-            
-            return None
+        """Get current crypto price in USD (cached for 60 seconds)"""
+        return self.get_crypto_prices([currency])[currency]
+    
+    def get_crypto_prices(self, currencies: List[str]) -> Dict[str, Optional[float]]:
+        """Get current USD prices for several currencies with one CoinGecko request
+        
+        Prices are cached for 60 seconds per currency; on failure the last known
+        price is returned, or None if the currency was never priced.
+        """
+        keys = list(dict.fromkeys(currency.lower() for currency in currencies))
+        prices: Dict[str, Optional[float]] = {}
+        missing = []
+        
+        with _price_lock:
+            for key in keys:
+                if key in _price_cache:
+                    prices[key] = _price_cache[key]
+                elif key in _COINGECKO_IDS:
+                    missing.append(key)
+        
+        if missing:
+            coin_ids = ",".join(sorted({_COINGECKO_IDS[key] for key in missing}))
+            try:
+                response = self.session.get(
+                    f"{COINGECKO_API_BASE}/simple/price?ids={coin_ids}&vs_currencies=usd",
+                    timeout=10
+                )
+                
+                if response.status_code == 200:
+                    data = response.json()
+                    with _price_lock:
+                        for key in missing:
+                            price = data.get(_COINGECKO_IDS[key], {}).get('usd')
+                            if price is not None:
+                                _price_cache[key] = price
+                                _last_known_prices[key] = price
+                                prices[key] = price
+                
+            except Exception as e:
+                logger.error(f"Error getting crypto prices: {e}")
             
-        except Exception as e:
-            logger.error(f"Error getting crypto price: {e}")
-            return None
+            # Fall back to the last known price rather than guessing
+            with _price_lock:
+                for key in missing:
+                    if key not in prices:
+                        prices[key] = _last_known_prices.get(key)
+        
+        return {currency: prices.get(currency.lower()) for currency in currencies}
     
     def get_supported_currencies(self) -> Dict[str, str]:
         """Get list of supported cryptocurrencies"""
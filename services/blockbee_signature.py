@@ -1,5 +1,6 @@
 # blockbee_signature.py
 import base64
+import logging
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import serialization
@@ -7,6 +8,18 @@ from cryptography.hazmat.backends import default_backend
 from flask import request
 from config import BLOCKBEE_PUBLIC_KEY
 
+logger = logging.getLogger(__name__)
+
+# Parse the PEM once per process; every webhook reuses the same key object
+try:
+    _PUBLIC_KEY = serialization.load_pem_public_key(
+        BLOCKBEE_PUBLIC_KEY.encode(),
+        backend=default_backend()
+    )
+except ValueError as e:
+    logger.error(f"Invalid BLOCKBEE_PUBLIC_KEY, webhook signatures cannot be verified: {e}")
+    _PUBLIC_KEY = None
+
 
 def verify_blockbee_signature(req=None):
     """
@@ -15,7 +28,7 @@ def verify_blockbee_signature(req=None):
     """
     req = req or request
     signature_b64 = req.headers.get('x-ca-signature')
-    if not signature_b64:
+    if not signature_b64 or _PUBLIC_KEY is None:
         return False
 
     # Determine data to verify
@@ -24,16 +37,10 @@ def verify_blockbee_signature(req=None):
     else:
         data_to_verify = req.get_data(as_text=True)
 
-    # Load the public key
-    public_key = serialization.load_pem_public_key(
-        BLOCKBEE_PUBLIC_KEY.encode(),
-        backend=default_backend()
-    )
-
     # Decode and verify
     try:
         signature = base64.b64decode(signature_b64)
-        public_key.verify(
+        _PUBLIC_KEY.verify(
             signature,
             data_to_verify.encode(),
             padding.PKCS1v15(),
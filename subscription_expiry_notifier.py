@@ -4,31 +4,113 @@ Handles automated notifications for subscription expiries
 """
 import asyncio
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
 from typing import List
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 from database import SessionLocal
 from models import User, Subscription
 from telegram import Bot
-from telegram.error import TelegramError
+from telegram.error import TelegramError, RetryAfter
 from config import TELEGRAM_BOT_TOKEN, SUPPORT_EMAIL
 
 logger = logging.getLogger(__name__)
 
 class SubscriptionExpiryNotifier:
+    # Telegram allows ~30 messages/second globally and 1 message/second per chat
+    MAX_CONCURRENT_SENDS = 30
+    MAX_SENDS_PER_SECOND = 30
+    PER_CHAT_INTERVAL = 1.0
+    MAX_SEND_ATTEMPTS = 3
+    
     def __init__(self):
         self.bot = Bot(token=TELEGRAM_BOT_TOKEN)
     
+    async def _dispatch_notifications(self, jobs):
+        """Run (chat_id, send_coroutine_function, args) jobs through a bounded worker pool
+        
+        Sends run concurrently up to MAX_CONCURRENT_SENDS, but start at no more than
+        MAX_SENDS_PER_SECOND overall and one per PER_CHAT_INTERVAL for the same chat.
+        A send rejected with RetryAfter is retried after the delay Telegram asks for.
+        """
+        if not jobs:
+            return
+        
+        queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+        
+        loop = asyncio.get_running_loop()
+        send_interval = 1.0 / self.MAX_SENDS_PER_SECOND
+        next_send_at = loop.time()
+        chat_limits = defaultdict(lambda: asyncio.Semaphore(1))
+        chat_last_sent = {}
+        
+        async def wait_for_send_slot(chat_id):
+            nonlocal next_send_at
+            # Per chat: sends are already serialised, so just keep them PER_CHAT_INTERVAL apart
+            last_sent = chat_last_sent.get(chat_id)
+            if last_sent is not None:
+                delay = last_sent + self.PER_CHAT_INTERVAL - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            # Global: reserve the next evenly spaced start slot, so the rate holds
+            # however quickly individual sends complete
+            now = loop.time()
+            slot = max(now, next_send_at)
+            next_send_at = slot + send_interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            chat_last_sent[chat_id] = loop.time()
+        
+        async def worker():
+            while True:
+                chat_id, send, args = await queue.get()
+                try:
+                    async with chat_limits[chat_id]:
+                        for attempt in range(1, self.MAX_SEND_ATTEMPTS + 1):
+                            await wait_for_send_slot(chat_id)
+                            try:
+                                await send(*args)
+                                break
+                            except RetryAfter as e:
+                                retry_after = e.retry_after
+                                if isinstance(retry_after, timedelta):
+                                    retry_after = retry_after.total_seconds()
+                                if attempt == self.MAX_SEND_ATTEMPTS:
+                                    raise
+                                logger.warning(f"Rate limited sending to chat {chat_id}, retrying in {retry_after}s")
+                                await asyncio.sleep(retry_after)
+                except Exception as e:
+                    logger.error(f"Error sending notification to chat {chat_id}: {e}")
+                finally:
+                    queue.task_done()
+        
+        workers = [
+            asyncio.create_task(worker())
+            for _ in range(min(self.MAX_CONCURRENT_SENDS, len(jobs)))
+        ]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    
     async def check_expiring_subscriptions(self):
         """Check for subscriptions that need expiry notifications"""
         try:
-            with SessionLocal() as db:
+            # One short sweep: keep loaded subscriptions usable after the per-send commits
+            # instead of reloading each one
+            with SessionLocal(expire_on_commit=False) as db:
                 # Get current time
                 now = datetime.utcnow()
                 three_days_from_now = now + timedelta(days=3)
                 
                 # Find subscriptions expiring in 3 days (warning notification)
-                warning_subscriptions = db.query(Subscription).join(User).filter(
+                warning_subscriptions = db.query(Subscription).join(User).options(
+                    contains_eager(Subscription.user)
+                ).filter(
                     Subscription.status == 'active',
                     Subscription.expires_at <= three_days_from_now,
                     Subscription.expires_at > now,
@@ -36,20 +118,25 @@ class SubscriptionExpiryNotifier:
                 ).all()
                 
                 # Find subscriptions expiring today (final notification)
-                expiring_today_subscriptions = db.query(Subscription).join(User).filter(
+                expiring_today_subscriptions = db.query(Subscription).join(User).options(
+                    contains_eager(Subscription.user)
+                ).filter(
                     Subscription.status == 'active',
                     Subscription.expires_at <= now + timedelta(hours=24),
                     Subscription.expires_at > now,
                     Subscription.expiry_final_notice_sent != True  # Haven't sent final notice
                 ).all()
                 
-                # Send warning notifications (3 days before)
-                for subscription in warning_subscriptions:
-                    await self._send_expiry_warning(subscription, db)
-                
-                # Send final notifications (expiry day)
-                for subscription in expiring_today_subscriptions:
-                    await self._send_expiry_final_notice(subscription, db)
+                # Send warning notifications (3 days before) and final notifications (expiry day)
+                await self._dispatch_notifications(
+                    [
+                        (subscription.user.telegram_id, self._send_expiry_warning, (subscription, db))
+                        for subscription in warning_subscriptions
+                    ] + [
+                        (subscription.user.telegram_id, self._send_expiry_final_notice, (subscription, db))
+                        for subscription in expiring_today_subscriptions
+                    ]
+                )
                 
                 # Check for expired subscriptions to deactivate
                 await self._deactivate_expired_subscriptions(db)
@@ -90,6 +177,8 @@ Need help? Contact @{SUPPORT_EMAIL}."""
             
             logger.info(f"Sent expiry warning to user {user.telegram_id}")
             
+        except RetryAfter:
+            raise
         except TelegramError as e:
             logger.error(f"Failed to send expiry warning to user {subscription.user.telegram_id}: {e}")
         except Exception as e:
@@ -131,6 +220,8 @@ Renew now to continue unlimited validation!"""
             
             logger.info(f"Sent final expiry notice to user {user.telegram_id}")
             
+        except RetryAfter:
+            raise
         except TelegramError as e:
             logger.error(f"Failed to send final notice to user {subscription.user.telegram_id}: {e}")
         except Exception as e:
@@ -140,23 +231,28 @@ Renew now to continue unlimited validation!"""
         """Deactivate subscriptions that have expired"""
         try:
             now = datetime.utcnow()
-            expired_subscriptions = db.query(Subscription).join(User).filter(
+            expired_subscriptions = db.query(Subscription).join(User).options(
+                contains_eager(Subscription.user)
+            ).filter(
                 Subscription.status == 'active',
                 Subscription.expires_at <= now
             ).all()
             
-            for subscription in expired_subscriptions:
-                # Deactivate subscription
-                subscription.status = 'expired'
-                
-                # Send expiry confirmation
-                await self._send_expiry_confirmation(subscription)
-                
-                logger.info(f"Deactivated expired subscription for user {subscription.user.telegram_id}")
+            if not expired_subscriptions:
+                return
+            
+            # Deactivate the whole expired cohort in one statement and commit before any
+            # network sends, so no write transaction is held open across them
+            expired_ids = [subscription.id for subscription in expired_subscriptions]
+            Subscription.expire_bulk(db, expired_ids)
+            db.commit()
+            logger.info(f"Deactivated {len(expired_subscriptions)} expired subscriptions")
             
-            if expired_subscriptions:
-                db.commit()
-                logger.info(f"Deactivated {len(expired_subscriptions)} expired subscriptions")
+            # Send expiry confirmations concurrently
+            await self._dispatch_notifications([
+                (subscription.user.telegram_id, self._send_expiry_confirmation, (subscription,))
+                for subscription in expired_subscriptions
+            ])
                 
         except Exception as e:
             logger.error(f"Error deactivating expired subscriptions: {e}")
@@ -190,6 +286,8 @@ Thank you for using Validator Pro!"""
                 parse_mode='Markdown'
             )
             
+        except RetryAfter:
+            raise
         except TelegramError as e:
             logger.error(f"Failed to send expiry confirmation to user {subscription.user.telegram_id}: {e}")
         except Exception as e:
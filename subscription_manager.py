@@ -48,7 +48,7 @@ class SubscriptionManager:
             subscription.status = 'failed'
         
         self.db_session.add(subscription)
-        self.db_session.commit()
+        self.db_session.flush()
         return subscription
     
 
@@ -74,7 +74,7 @@ class SubscriptionManager:
     def activate_subscription(self, subscription: Subscription) -> None:
         """Activate a subscription"""
         subscription.activate()
-        self.db_session.commit()
+        self.db_session.flush()
     
 
     
@@ -82,11 +82,16 @@ class SubscriptionManager:
         """Get the active subscription for a user"""
         return user.get_active_subscription()
     
-    def check_subscription_expiry(self, user: User) -> Dict[str, Any]:
-        """Check subscription expiry status"""
-        active_sub = self.get_active_subscription(user)
+    def check_subscription_expiry(self, user: User, include_subscription: bool = False) -> Dict[str, Any]:
+        """Check subscription expiry status
         
-        if not active_sub:
+        Only the id and expiry of the active subscription are fetched. Callers that
+        need the Subscription itself pass include_subscription=True, which costs a
+        second query.
+        """
+        active_row = Subscription.get_active_slim(self.db_session, user.id)
+        
+        if not active_row:
             return {
                 'has_subscription': False,
                 'is_expired': True,
@@ -94,16 +99,19 @@ class SubscriptionManager:
                 'expires_at': None
             }
         
-        days_remaining = active_sub.days_remaining()
+        days_remaining = Subscription.days_until(active_row.expires_at) if active_row.expires_at else 0
         is_expired = days_remaining <= 0
         
-        return {
+        status = {
             'has_subscription': True,
             'is_expired': is_expired,
             'days_remaining': days_remaining,
-            'expires_at': active_sub.expires_at,
-            'subscription': active_sub
+            'expires_at': active_row.expires_at
         }
+        if include_subscription:
+            status['subscription'] = self.db_session.get(Subscription, active_row.id)
+        
+        return status
     
     def get_subscription_history(self, user: User) -> list:
         """Get user's subscription history"""
@@ -112,6 +120,14 @@ class SubscriptionManager:
     def cancel_subscription(self, subscription: Subscription) -> None:
         """Cancel a subscription"""
         subscription.status = 'cancelled'
+        self.db_session.flush()
+    
+    def commit(self) -> None:
+        """Commit pending subscription changes
+        
+        The create/activate/cancel helpers only flush, so callers commit once at
+        the end of the request and several state changes share one transaction.
+        """
         self.db_session.commit()
     
     def send_expiry_notification(self, user: User, days_remaining: int) -> Dict[str, str]:
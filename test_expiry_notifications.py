@@ -25,8 +25,7 @@ async def create_test_subscriptions():
                 last_name="User"
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            db.flush()  # Assign user.id; everything is committed once below
         
         # Create subscription expiring in 3 days (for warning test)
         warning_subscription = Subscription(
@@ -63,9 +62,7 @@ async def create_test_subscriptions():
             expires_at=datetime.utcnow() - timedelta(hours=1)
         )
         
-        db.add(warning_subscription)
-        db.add(final_subscription)
-        db.add(expired_subscription)
+        db.add_all([warning_subscription, final_subscription, expired_subscription])
         db.commit()
         
         print("Created test subscriptions:")
@@ -80,13 +77,17 @@ async def test_expiry_notifications():
     await run_expiry_check()
     print("Expiry check completed!")
 
-if __name__ == "__main__":
+async def main():
+    """Run setup and expiry check on a single event loop"""
     print("=== Subscription Expiry Notification Test ===")
     print("\n1. Creating test subscriptions...")
-    asyncio.run(create_test_subscriptions())
+    await create_test_subscriptions()
     
     print("\n2. Running expiry notifications...")
-    asyncio.run(test_expiry_notifications())
+    await test_expiry_notifications()
     
     print("\n3. Test completed!")
-    print("Check your Telegram bot for notifications if you used your real Telegram ID.")
\ No newline at end of file
+    print("Check your Telegram bot for notifications if you used your real Telegram ID.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
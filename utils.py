@@ -1,20 +1,36 @@
 """
 Utility functions for the email validator bot
 """
+import csv
 import os
 import re
-import hashlib
-from datetime import datetime, timedelta
+import secrets
+import threading
+import time
+from datetime import datetime
 from typing import List, Optional
 import pandas as pd
 import logging
+from cachetools import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Short-lived cache of BlockBee verification results keyed on tx_hash, so repeated
+# checks of the same transaction within a confirmation window share one lookup
+_tx_verification_cache = TTLCache(maxsize=1024, ttl=30)
+_tx_verification_lock = threading.Lock()
+
+# Shared BlockBee client, created on first use
+_blockbee_service = None
+
+EMAIL_SYNTAX_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+
+# Compiled once; is_valid_email_syntax runs for every row of an uploaded file
+_EMAIL_RE = re.compile(EMAIL_SYNTAX_PATTERN)
+
 def is_valid_email_syntax(email: str) -> bool:
     """Check if email has valid syntax"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
 def extract_domain(email: str) -> Optional[str]:
     """Extract domain from email address"""
@@ -23,28 +39,34 @@ def extract_domain(email: str) -> Optional[str]:
     except (IndexError, AttributeError):
         return None
 
+_SIZE_NAMES = ("B", "KB", "MB", "GB")
+
 def format_file_size(size_bytes: int) -> str:
     """Format file size in human readable format"""
     if size_bytes == 0:
         return "0 B"
     
-    size_names = ["B", "KB", "MB", "GB"]
-    import math
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, i)
-    s = round(size_bytes / p, 2)
-    return f"{s} {size_names[i]}"
+    # floor(log1024(n)) and 1024**i via bit arithmetic
+    i = min((int(size_bytes).bit_length() - 1) // 10, len(_SIZE_NAMES) - 1)
+    s = round(size_bytes / (1 << (i * 10)), 2)
+    return f"{s} {_SIZE_NAMES[i]}"
 
 def generate_job_id() -> str:
     """Generate unique job ID"""
-    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-    random_hash = hashlib.md5(str(datetime.utcnow().timestamp()).encode()).hexdigest()[:8]
-    return f"job_{timestamp}_{random_hash}"
+    return f"job_{datetime.utcnow():%Y%m%d_%H%M%S}_{secrets.token_hex(4)}"
+
+# Prebuilt bar segments, sliced to size instead of rebuilt on every call
+_BAR_MAX_LENGTH = 100
+_FILL = '█' * _BAR_MAX_LENGTH
+_EMPTY = '░' * _BAR_MAX_LENGTH
 
 def create_progress_bar(percentage: float, length: int = 20) -> str:
     """Create a Unicode progress bar"""
-    filled_length = int(length * percentage / 100)
-    bar = '█' * filled_length + '░' * (length - filled_length)
+    filled_length = min(max(int(length * percentage / 100), 0), length)
+    if length > _BAR_MAX_LENGTH:
+        bar = '█' * filled_length + '░' * (length - filled_length)
+    else:
+        bar = _FILL[:filled_length] + _EMPTY[:length - filled_length]
     return f"[{bar}] {percentage:.1f}%"
 
 def format_duration(seconds: int) -> str:
@@ -63,29 +85,37 @@ def format_duration(seconds: int) -> str:
 
 def create_results_csv(results: List[dict], output_path: str) -> None:
     """Create CSV file with validation results"""
-    df = pd.DataFrame(results)
-    df.to_csv(output_path, index=False)
+    fieldnames = list(results[0].keys()) if results else []
+    
+    # Rows with differing keys need pandas to build the union of columns
+    if not fieldnames or any(row.keys() != results[0].keys() for row in results):
+        pd.DataFrame(results).to_csv(output_path, index=False)
+        return
+    
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(results)
 
 def clean_old_files(directory: str, max_age_hours: int = 24) -> None:
     """Clean up old files from directory"""
-    cutoff_time = datetime.utcnow() - timedelta(hours=max_age_hours)
+    # Compare raw epoch seconds against the cached stat() of each directory entry
+    cutoff_ts = time.time() - max_age_hours * 3600
     
     try:
-        for filename in os.listdir(directory):
-            file_path = os.path.join(directory, filename)
-            if os.path.isfile(file_path):
-                file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                if file_time < cutoff_time:
-                    os.remove(file_path)
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff_ts:
+                    os.remove(entry.path)
     except Exception as e:
         print(f"Error cleaning old files: {e}")
 
+# Markdown special characters mapped to their escaped form, applied in a single pass
+_MD_TABLE = {ord(c): f"\\{c}" for c in "_*[]()~`>#+-=|{}.!"}
+
 def escape_markdown(text: str) -> str:
     """Escape markdown special characters"""
-    special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-    for char in special_chars:
-        text = text.replace(char, f'\\{char}')
-    return text
+    return text.translate(_MD_TABLE)
 
 def format_crypto_address(address: str, length: int = 16) -> str:
     """Format crypto address for display"""
@@ -93,14 +123,29 @@ def format_crypto_address(address: str, length: int = 16) -> str:
         return address
     return f"{address[:8]}...{address[-8:]}"
 
+def _get_blockbee_service():
+    """Get shared BlockBee service instance"""
+    global _blockbee_service
+    if _blockbee_service is None:
+        from services.blockbee_service import BlockBeeService
+        _blockbee_service = BlockBeeService()
+    return _blockbee_service
+
 def validate_crypto_transaction(tx_hash: str, expected_amount: float, currency: str) -> bool:
     """Validate crypto transaction via BlockBee API"""
-    from services.blockbee_service import BlockBeeService
-    
     try:
-        blockbee = BlockBeeService()
-        # Use BlockBee's verification system instead of direct blockchain queries
-        verification_result = blockbee.verify_payment(tx_hash)
+        with _tx_verification_lock:
+            verification_result = _tx_verification_cache.get(tx_hash)
+        
+        if verification_result is None:
+            # Use BlockBee's verification system instead of direct blockchain queries
+            verification_result = _get_blockbee_service().verify_payment(tx_hash)
+            
+            # Pending results are cached too and expire with the TTL; failed lookups are
+            # not, so a transient API error is retried on the next call
+            if verification_result.get('success'):
+                with _tx_verification_lock:
+                    _tx_verification_cache[tx_hash] = verification_result
         
         if verification_result.get('success'):
             amount_received = verification_result.get('amount_received', 0)
@@ -115,4 +160,7 @@ def validate_crypto_transaction(tx_hash: str, expected_amount: float, currency:
         logger.error(f"Error validating crypto transaction: {e}")
         return False
 
-
+def invalidate_crypto_transaction(tx_hash: str) -> None:
+    """Drop cached verification results for a transaction (e.g. on webhook delivery)"""
+    with _tx_verification_lock:
+        _tx_verification_cache.pop(tx_hash, None)
@@ -2,13 +2,193 @@
 Webhook handler for BlockBee payment confirmations
 """
 import logging
+import threading
+import requests
+from collections import OrderedDict
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
 from flask import Flask, request, jsonify
+from sqlalchemy import update
 from database import SessionLocal
-from models import Subscription
+from models import Subscription, User
+from services.blockbee_signature import verify_blockbee_signature
+from config import (
+    BLOCKBEE_VERIFY_SIGNATURE, BLOCKBEE_WEBHOOK_URL, TELEGRAM_BOT_TOKEN, TELEGRAM_API_BASE,
+    TOLERANCE, SUBSCRIPTION_DURATION_DAYS
+)
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
 
 logger = logging.getLogger(__name__)
 
+# Use orjson for webhook and Telegram payloads when it is installed
+if find_spec('orjson') is not None:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+else:
+    import json
+    _json_dumps = lambda obj: json.dumps(obj).encode()
+    _json_loads = json.loads
+
+# Payment confirmations are sent off the request thread so the webhook can answer BlockBee immediately
+_notification_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='payment-notify')
+
+# Keep-alive connections to the Telegram API, shared by every notification
+TG_SESSION = requests.Session()
+TG_SESSION.mount('https://', HTTPAdapter(pool_connections=50, pool_maxsize=50))
+
+# Keep-alive connections to the payment API that legacy webhooks are forwarded to
+FWD_SESSION = requests.Session()
+FWD_SESSION.mount('http://', HTTPAdapter(pool_connections=20, pool_maxsize=20))
+
+# BlockBee callback fields read by this handler and the payment API; other query args are ignored
+WEBHOOK_FIELDS = (
+    'order_id', 'uid', 'coin', 'status', 'price', 'txid', 'txid_in',
+    'address_in', 'address', 'confirmations', 'value_coin'
+)
+
+# Recently handled (payment_address, txid) pairs, so confirmation retries skip the database.
+# Keyed on the address too because one transaction can pay several BlockBee addresses
+_SEEN_TXIDS = OrderedDict()
+_SEEN_TXIDS_MAX = 10_000
+_seen_txids_lock = threading.Lock()
+
+TELEGRAM_SEND_URL = f"{TELEGRAM_API_BASE}/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+
+NOTIFICATION_TMPL = """✅ **Payment Confirmed!**
+
+Your subscription has been activated successfully.
+
+**Order ID:** `{order_id}`
+**Status:** Active
+**Duration:** {duration_days} days
+**Features:** Unlimited email & phone validation
+
+You can now validate unlimited emails and phone numbers!"""
+
+@lru_cache(maxsize=4096)
+def _telegram_id_for(user_id):
+    """Telegram chat ID for a user; cached because it never changes once the user exists"""
+    with SessionLocal() as db:
+        return db.query(User.telegram_id).filter(User.id == user_id).scalar()
+
+def _txid_seen(payment_address, txid):
+    """Check whether a confirmed transaction to this address was already handled"""
+    if not txid:
+        return False
+    key = (payment_address, txid)
+    with _seen_txids_lock:
+        if key in _SEEN_TXIDS:
+            _SEEN_TXIDS.move_to_end(key)
+            return True
+    return False
+
+def _remember_txid(payment_address, txid):
+    """Record a handled transaction, evicting the oldest beyond the size limit"""
+    if not txid:
+        return
+    key = (payment_address, txid)
+    with _seen_txids_lock:
+        _SEEN_TXIDS[key] = None
+        _SEEN_TXIDS.move_to_end(key)
+        if len(_SEEN_TXIDS) > _SEEN_TXIDS_MAX:
+            _SEEN_TXIDS.popitem(last=False)
+
+def _send_payment_notification(subscription_id, subscription_user_id):
+    """Send the payment confirmation message to the user via the Telegram API"""
+    try:
+        telegram_chat_id = _telegram_id_for(subscription_user_id)
+        
+        logger.info("Attempting to send notification to chat_id: %s", telegram_chat_id)
+        
+        # Send direct notification via Telegram API
+        notification_text = NOTIFICATION_TMPL.format(order_id=subscription_id, duration_days=SUBSCRIPTION_DURATION_DAYS)
+        
+        logger.info("Sending notification to Telegram API...")
+        
+        response = TG_SESSION.post(TELEGRAM_SEND_URL, data=_json_dumps({
+            'chat_id': telegram_chat_id,
+            'text': notification_text,
+            'parse_mode': 'Markdown'
+        }), headers={'Content-Type': 'application/json'}, timeout=5)
+        
+        logger.debug("Telegram API response: %s - %s", response.status_code, response.text)
+        
+        if response.status_code == 200:
+            logger.info("✅ Payment notification sent successfully to user %s (chat_id: %s)", subscription_user_id, telegram_chat_id)
+        else:
+            logger.error("❌ Failed to send notification: %s", response.text)
+            
+    except Exception as e:
+        logger.error(f"❌ Exception in payment notification: {e}")
+
+def _activate_subscription_from_webhook(payment_address, data):
+    """Activate the pending subscription paid to payment_address and notify its owner
+    
+    Returns True if a subscription was activated, False for retries, duplicates and
+    unknown addresses.
+    """
+    txid = data.get('txid_in')
+    if _txid_seen(payment_address, txid):
+        logger.info("Transaction %s to %s already handled, skipping", txid, payment_address)
+        return False
+    
+    # Activate the pending subscription for this address in a single statement.
+    # A concurrent duplicate webhook blocks on the row lock, then finds it no longer
+    # pending and gets no row back, so each payment is activated and notified once
+    activated_at = datetime.utcnow()
+    with SessionLocal() as db, db.begin():
+        activated = db.execute(
+            update(Subscription)
+            .where(Subscription.payment_address == payment_address, Subscription.status == 'pending')
+            .values(
+                status='active',
+                activated_at=activated_at,
+                expires_at=activated_at + timedelta(days=SUBSCRIPTION_DURATION_DAYS),
+                transaction_hash=txid or ''
+            )
+            .returning(Subscription.id, Subscription.user_id, Subscription.amount_usd)
+        ).first()
+    
+    # Only remembered once the outcome is committed, so a failed attempt is retried
+    _remember_txid(payment_address, txid)
+    
+    if not activated:
+        logger.info("No pending subscription for address %s (already active or unknown), skipping", payment_address)
+        return False
+    
+    subscription_id, subscription_user_id, amount_usd = activated
+    
+    # Check payment amount tolerance
+    payment_amount = float(data.get('price', 0))
+    expected_amount = float(amount_usd) if amount_usd else 0.0
+    
+    tolerance = TOLERANCE if TOLERANCE else 2  #
+    # Only apply $2 tolerance when payment is less than expected
+    if payment_amount < expected_amount:
+        shortage = expected_amount - payment_amount
+        if shortage > tolerance:
+            logger.warning("Payment $%s is $%.2f less than expected $%s (exceeds $%s tolerance)", payment_amount, shortage, expected_amount, tolerance)
+            # Still accept the payment but log the warning
+        else:
+            logger.info("Payment $%s is $%.2f less than expected $%s (within $%s tolerance)", payment_amount, shortage, expected_amount, tolerance)
+    elif payment_amount > expected_amount:
+        overage = payment_amount - expected_amount
+        logger.info("Payment $%s is $%.2f more than expected $%s (overpayment accepted)", payment_amount, overage, expected_amount)
+    else:
+        logger.info("Payment $%s matches expected amount exactly", payment_amount)
+    
+    logger.info("Subscription %s activated for user %s", subscription_id, subscription_user_id)
+    
+    # Notify the user in the background; BlockBee only needs the webhook's "ok" and
+    # the session is already closed, so nothing here waits on Telegram
+    _notification_executor.submit(
+        _send_payment_notification, subscription_id, subscription_user_id
+    )
+    return True
+
 def create_webhook_app():
     """Create Flask app for webhook handling (Legacy System)"""
     app = Flask(__name__)
@@ -30,7 +210,6 @@ def create_webhook_app():
     @app.route('/webhook', methods=['POST'])
     @app.route('/webhook/blockbee', methods=['POST', 'GET'])
     def redirect_to_new_system():
-        import requests
         try:
             # Preserve the original query string (order_id, uid, coin, ...)
             qs = request.query_string.decode()  # e.g. "order_id=24&uid=1&coin=ltc"
@@ -42,11 +221,14 @@ def create_webhook_app():
                 sig = request.headers.get("x-ca-signature")
                 if sig:
                     headers["x-ca-signature"] = sig
+                # Buffered on purpose: requests cannot size werkzeug's input stream and would
+                # send it chunked, which the payment API rejects
                 raw = request.get_data(cache=False)
-                resp = requests.post(fwd_url, data=raw, headers=headers, timeout=30)
+                resp = FWD_SESSION.post(fwd_url, data=raw, headers=headers, timeout=30)
             else:
-                # GET has no body; forward only the query params as JSON (for testing/back-compat)
-                resp = requests.post(fwd_url, json=request.args.to_dict(flat=True), timeout=30)
+                # GET has no body; forward only the known query params as JSON (for testing/back-compat)
+                payload = {key: request.args[key] for key in WEBHOOK_FIELDS if key in request.args}
+                resp = FWD_SESSION.post(fwd_url, json=payload, timeout=30)
 
             logger.info(f"Forwarded webhook to new system: {resp.status_code}")
             return resp.text, resp.status_code
@@ -60,20 +242,25 @@ def create_webhook_app():
     def handle_blockbee_webhook_legacy(user_id=None, currency=None, amount_usd=None):
         """Handle BlockBee payment confirmations (Legacy System)"""
         try:
-            # Log all webhook calls
-            logger.info("=== BlockBee Webhook Received ===")
-            logger.info(f"Method: {request.method}")
-            logger.info(f"Path params: user_id={user_id}, currency={currency}, amount_usd={amount_usd}")
-            logger.info(f"Query params: {dict(request.args)}")
-            logger.info(f"Headers: {dict(request.headers)}")
+            # Log all webhook calls; the full request dump is only built when debugging
+            logger.info("=== BlockBee Webhook Received === %s", request.method)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Path params: user_id=%s, currency=%s, amount_usd=%s", user_id, currency, amount_usd)
+                logger.debug("Query params: %s", dict(request.args))
+                logger.debug("Headers: %s", dict(request.headers))
+            
+            # Reject unsigned or forged callbacks before doing any database work
+            if BLOCKBEE_VERIFY_SIGNATURE and not verify_blockbee_signature(request):
+                logger.error("Invalid BlockBee signature")
+                return "Invalid signature", 401
             
             # BlockBee sends data as GET parameters by default
             if request.method == 'GET':
-                data = dict(request.args)
+                data = {key: request.args[key] for key in WEBHOOK_FIELDS if key in request.args}
             else:
-                data = request.get_json() or {}
+                data = (_json_loads(request.get_data()) if request.is_json else None) or {}
             
-            logger.info(f"Webhook data: {data}")
+            logger.debug("Webhook data: %s", data)
             
             # BlockBee sends payment address as 'address_in' in real webhooks
             payment_address = data.get('address_in') or data.get('address')
@@ -84,128 +271,26 @@ def create_webhook_app():
                 return "ok", 200
             
             # Verify payment in BlockBee data
-            # BlockBee uses string "1" not integer 1
-            if str(data.get('status')) != '1':  # 1 means confirmed
-                logger.info(f"Payment not confirmed yet: {data.get('status')}")
+            # BlockBee sends string "1" in query args; JSON bodies may carry 1 or true
+            status = data.get('status')
+            if status not in ('1', 1, True):  # 1 means confirmed
+                logger.debug("Payment not confirmed yet: %s", status)
                 # Still return ok for BlockBee
                 return "ok", 200
             
-            # Update subscription status - find by payment address
-            with SessionLocal() as db:
-                # Find subscription by payment address
-                subscription = db.query(Subscription).filter(
-                    Subscription.payment_address == payment_address
-                ).filter(
-                    Subscription.status == 'pending'
-                ).first()
-                
-                if not subscription:
-                    # Check if there's already an active subscription for this address
-                    active_sub = db.query(Subscription).filter(
-                        Subscription.payment_address == payment_address
-                    ).filter(
-                        Subscription.status == 'active'
-                    ).first()
-                    
-                    if active_sub:
-                        logger.info(f"Subscription already active for address {payment_address}, skipping duplicate notification")
-                        return "ok", 200
-                    
-                    logger.error(f"No pending subscription found for address {payment_address}")
-                    # Return ok even for errors
-                    return "ok", 200
-                
-
-                
-                # Check payment amount tolerance
-                payment_amount = float(data.get('price', 0))
-                expected_amount = float(subscription.amount_usd) if subscription.amount_usd else 0.0
-                
-                from config import TOLERANCE
-                tolerance = TOLERANCE if TOLERANCE else 2  #
-                # Only apply $2 tolerance when payment is less than expected
-                if payment_amount < expected_amount:
-                    shortage = expected_amount - payment_amount
-                    if shortage > tolerance:
-                        logger.warning(f"Payment ${payment_amount} is ${shortage:.2f} less than expected ${expected_amount} (exceeds ${tolerance} tolerance)")
-                        # Still accept the payment but log the warning
-                    else:
-                        logger.info(f"Payment ${payment_amount} is ${shortage:.2f} less than expected ${expected_amount} (within ${tolerance} tolerance)")
-                elif payment_amount > expected_amount:
-                    overage = payment_amount - expected_amount
-                    logger.info(f"Payment ${payment_amount} is ${overage:.2f} more than expected ${expected_amount} (overpayment accepted)")
-                else:
-                    logger.info(f"Payment ${payment_amount} matches expected amount exactly")
-                
-                # Always activate subscription - accept any overpayment, and underpayments within $3
-                
-                # Get the user's Telegram chat ID from subscription
-                from models import User
-                user = db.query(User).filter(User.id == subscription.user_id).first()
-                telegram_chat_id = user.telegram_id if user else None
-                
-                # Activate subscription (already verified subscription exists above)
-                if subscription:
-                    subscription.status = 'active'
-                    subscription.activated_at = datetime.utcnow()
-                    subscription.expires_at = datetime.utcnow() + timedelta(days=30)
-                    subscription.transaction_hash = data.get('txid_in', '')
-                    
-                    db.commit()
-                    
-                    logger.info(f"Subscription {subscription.id} activated for user {subscription.user_id}")
-                
-                # Send notification to user about successful payment
-                try:
-                    import requests
-                    import json
-                    from config import TELEGRAM_BOT_TOKEN
-                    
-                    logger.info(f"Attempting to send notification to chat_id: {telegram_chat_id}")
-                    
-                    # Send direct notification via Telegram API
-                    notification_text = f"""✅ **Payment Confirmed!**
-
-Your subscription has been activated successfully.
-
-**Order ID:** `{subscription.id if subscription else 'Unknown'}`
-**Status:** Active
-**Duration:** 30 days
-**Features:** Unlimited email & phone validation
-
-You can now validate unlimited emails and phone numbers!"""
-                    
-                    telegram_url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-                    logger.info(f"Sending notification to Telegram API...")
-                    
-                    response = requests.post(telegram_url, json={
-                        'chat_id': telegram_chat_id,
-                        'text': notification_text,
-                        'parse_mode': 'Markdown'
-                    })
-                    
-                    logger.info(f"Telegram API response: {response.status_code} - {response.text}")
-                    
-                    if response.status_code == 200:
-                        logger.info(f"✅ Payment notification sent successfully to user {subscription.user_id if subscription else 'unknown'} (chat_id: {telegram_chat_id})")
-                    else:
-                        logger.error(f"❌ Failed to send notification: {response.text}")
-                        
-                except Exception as e:
-                    logger.error(f"❌ Exception in payment notification: {e}")
-                
-                # CRITICAL: BlockBee requires exactly "ok" response (not "*ok*")
-                return "ok", 200
+            _activate_subscription_from_webhook(payment_address, data)
+            
+            # CRITICAL: BlockBee requires exactly "ok" response (not "*ok*")
+            return "ok", 200
             
         except Exception as e:
-            logger.error(f"Error processing BlockBee webhook: {e}")
+            logger.error("Error processing BlockBee webhook: %s", e)
             # Still return ok to prevent retries
             return "ok", 200
     
     @app.route('/webhook/test', methods=['GET'])
     def webhook_info():
         """Return webhook information"""
-        from config import BLOCKBEE_WEBHOOK_URL
         return jsonify({
             'status': 'active',
             'webhook': 'BlockBee payment webhook',
@@ -234,7 +319,6 @@ You can now validate unlimited emails and phone numbers!"""
     @app.route('/webhook/logs', methods=['GET'])
     def webhook_logs():
         """Show recent webhook activity"""
-        from models import Subscription
         with SessionLocal() as db:
             pending_subs = db.query(Subscription).filter(
                 Subscription.status == 'pending'
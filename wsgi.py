@@ -0,0 +1,18 @@
+"""
+WSGI entry point for the legacy webhook server
+
+Usage:
+    PORT=5002 gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from importlib.util import find_spec
+
+# Patch blocking I/O before anything imports sockets, so HTTP calls yield to other
+# requests. Same condition gunicorn.conf.py uses to pick gevent workers; its post_fork
+# hook patches psycopg2
+if find_spec('gevent') is not None and find_spec('psycogreen') is not None:
+    from gevent import monkey
+    monkey.patch_all()
+
+from webhook_handler import create_webhook_app
+
+app = create_webhook_app()